@@ -0,0 +1,153 @@
+"""
+TTL cache for market data responses
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+import orjson
+import pandas as pd
+
+from config import get_api_config
+
+logger = logging.getLogger(__name__)
+
+class Cache:
+    """File-backed TTL cache with an in-memory layer
+    
+    Keys take the form "<endpoint>:<name>" (e.g. "yahoo_quote:AAPL") and are
+    stored under <cache_dir>/<endpoint>/<name>_<md5(params)>.<ext>.
+    """
+    
+    def __init__(self, cache_dir: Optional[str] = None):
+        self._cache_dir = cache_dir
+        self._memory: Dict[str, Tuple[float, Any]] = {}
+    
+    @property
+    def cache_dir(self) -> str:
+        # Resolved on use so creating the global cache doesn't build the API config
+        return self._cache_dir or get_api_config().cache_dir
+    
+    def get(self, key: str, ttl: float, params: Optional[Dict] = None) -> Optional[Any]:
+        """Return cached JSON data for key if it is younger than ttl seconds"""
+        return self._load(self._path(key, params, 'json'), ttl, self._read_json)
+    
+    def set(self, key: str, data: Any, params: Optional[Dict] = None) -> None:
+        """Store JSON-serializable data under key"""
+        self._store(self._path(key, params, 'json'), data, self._write_json)
+    
+    async def set_async(self, key: str, data: Any, params: Optional[Dict] = None) -> None:
+        """Like set(), but writes the file in a worker thread so the event loop never blocks on disk"""
+        await self._store_async(self._path(key, params, 'json'), data, self._write_json)
+    
+    def get_frame(self, key: str, ttl: float, params: Optional[Dict] = None) -> Optional[pd.DataFrame]:
+        """Return a cached DataFrame for key if it is younger than ttl seconds"""
+        return self._load(self._path(key, params, 'frame.json'), ttl, self._read_frame)
+    
+    def set_frame(self, key: str, frame: pd.DataFrame, params: Optional[Dict] = None) -> None:
+        """Store a numeric DataFrame with a DatetimeIndex under key"""
+        self._store(self._path(key, params, 'frame.json'), frame, self._write_frame)
+    
+    async def set_frame_async(self, key: str, frame: pd.DataFrame, params: Optional[Dict] = None) -> None:
+        """Like set_frame(), but writes the file in a worker thread"""
+        await self._store_async(self._path(key, params, 'frame.json'), frame, self._write_frame)
+    
+    def _path(self, key: str, params: Optional[Dict], ext: str) -> str:
+        endpoint, _, name = key.partition(':')
+        digest = hashlib.md5(json.dumps(params or {}, sort_keys=True).encode()).hexdigest()
+        return os.path.join(self.cache_dir, endpoint, f"{name}_{digest}.{ext}")
+    
+    def _load(self, path: str, ttl: float, reader: Callable[[str], Tuple[float, Any]]) -> Optional[Any]:
+        now = time.time()
+        
+        entry = self._memory.get(path)
+        if entry is None:
+            try:
+                entry = reader(path)
+            except FileNotFoundError:
+                return None
+            except Exception as e:
+                logger.debug(f"Ignoring unreadable cache entry {path}: {e}")
+                return None
+            self._memory[path] = entry
+        
+        ts, data = entry
+        if now - ts >= ttl:
+            return None
+        return data
+    
+    def _store(self, path: str, data: Any, writer: Callable[[str, float, Any], None]) -> None:
+        ts = time.time()
+        self._memory[path] = (ts, data)
+        self._persist(path, ts, data, writer)
+    
+    async def _store_async(self, path: str, data: Any, writer: Callable[[str, float, Any], None]) -> None:
+        # The in-memory entry is visible immediately; only the file write is offloaded
+        ts = time.time()
+        self._memory[path] = (ts, data)
+        await asyncio.to_thread(self._persist, path, ts, data, writer)
+    
+    def _persist(self, path: str, ts: float, data: Any, writer: Callable[[str, float, Any], None]) -> None:
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Per-thread temp file so concurrent offloaded writes of one key never collide
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            writer(tmp_path, ts, data)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.debug(f"Could not write cache entry {path}: {e}")
+    
+    @staticmethod
+    def _read_json(path: str) -> Tuple[float, Any]:
+        with open(path, 'r') as f:
+            blob = json.load(f)
+        return blob['ts'], blob['data']
+    
+    @staticmethod
+    def _write_json(path: str, ts: float, data: Any) -> None:
+        with open(path, 'w') as f:
+            json.dump({'ts': ts, 'data': data}, f)
+    
+    # Frames are stored as JSON (never pickle: loading a planted .cache file must not run code)
+    @staticmethod
+    def _read_frame(path: str) -> Tuple[float, pd.DataFrame]:
+        with open(path, 'rb') as f:
+            blob = orjson.loads(f.read())
+        names = blob['column_names']
+        if len(names) > 1:
+            columns = pd.MultiIndex.from_tuples([tuple(label) for label in blob['columns']], names=names)
+        else:
+            columns = pd.Index(blob['columns'], name=names[0])
+        index = pd.DatetimeIndex(blob['index'], name=blob['index_name'])
+        if blob['tz'] is not None:
+            index = index.tz_convert(blob['tz'])
+        frame = pd.DataFrame(
+            np.array(blob['data'], dtype=np.float64).reshape(len(index), len(columns)),
+            index=index,
+            columns=columns
+        )
+        return blob['ts'], frame
+    
+    @staticmethod
+    def _write_frame(path: str, ts: float, frame: pd.DataFrame) -> None:
+        # Split layout; NaN values are written as null and read back as NaN
+        blob = {
+            'ts': ts,
+            'index': [label.isoformat() for label in frame.index],
+            'index_name': frame.index.name,
+            'tz': None if frame.index.tz is None else str(frame.index.tz),
+            'columns': frame.columns.tolist(),
+            'column_names': list(frame.columns.names),
+            'data': np.ascontiguousarray(frame.to_numpy(dtype=np.float64))
+        }
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(blob, option=orjson.OPT_SERIALIZE_NUMPY))
+
+# Global cache instance
+cache = Cache()
@@ -3,10 +3,14 @@ Configuration settings for the Signals Bot
 """
 from dataclasses import dataclass
 from typing import List, Dict
+import functools
 import os
 from dotenv import load_dotenv
 
-load_dotenv()
+@functools.lru_cache(maxsize=1)
+def _load_env() -> None:
+    """Load the .env file into the environment (only once per process)"""
+    load_dotenv()
 
 @dataclass
 class TradingConfig:
@@ -50,23 +54,49 @@ class APIConfig:
     # Yahoo Finance (free)
     use_yfinance: bool = True
     
-    # Add other API keys here as needed
-    alpha_vantage_key: str = os.getenv('ALPHA_VANTAGE_KEY', '')
-    finnhub_key: str = os.getenv('FINNHUB_KEY', '')
+    # Add other API keys here as needed (read from the environment when not given)
+    alpha_vantage_key: str = None
+    finnhub_key: str = None
     
     # Rate limiting
     requests_per_second: float = 10.0
     max_concurrent_requests: int = 5
+    max_retries: int = 3
+    retry_backoff_seconds: float = 0.5
+    quote_timeout: float = 3.0  # Per-request timeout for Yahoo quotes
+    
+    # Response caching (TTLs in seconds)
+    cache_dir: str = '.cache'
+    quote_cache_ttl: int = 30
+    history_cache_ttl: int = 60  # Last daily bar is today's live price
+    info_cache_ttl: int = 7 * 24 * 3600
+    
+    def __post_init__(self):
+        _load_env()
+        if self.alpha_vantage_key is None:
+            self.alpha_vantage_key = os.getenv('ALPHA_VANTAGE_KEY', '')
+        if self.finnhub_key is None:
+            self.finnhub_key = os.getenv('FINNHUB_KEY', '')
+
+@functools.cache
+def get_api_config() -> APIConfig:
+    """Return the shared API configuration, built on first use"""
+    return APIConfig()
+
+def __getattr__(name: str):
+    # Keep `config.api_config` working without building it (and loading .env) at import
+    if name == 'api_config':
+        return get_api_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Global configuration instances
+# Global configuration instances (API settings come from get_api_config())
 trading_config = TradingConfig()
-api_config = APIConfig()
 
 # Most active premarket stocks list (can be updated)
-WATCHLIST_SYMBOLS = [
+WATCHLIST_SYMBOLS = (
     'AAPL', 'MSFT', 'GOOGL', 'AMZN', 'TSLA', 'NVDA', 'META', 'BRK.B',
     'LLY', 'AVGO', 'WMT', 'JPM', 'XOM', 'UNH', 'V', 'PG', 'MA', 'JNJ',
     'HD', 'CVX', 'ABBV', 'PEP', 'KO', 'BAC', 'TMO', 'COST', 'MRK', 'NFLX',
     'CRM', 'ACN', 'LIN', 'ABT', 'ADBE', 'CSCO', 'DHR', 'VZ', 'TXN', 'NKE',
     'WFC', 'PM', 'RTX', 'INTC', 'UPS', 'CMCSA', 'NEE', 'T', 'COP', 'ORCL'
-]
\ No newline at end of file
+)
\ No newline at end of file
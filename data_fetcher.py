@@ -4,146 +4,338 @@ Stock data fetcher for premarket and regular market data
 import yfinance as yf
 import pandas as pd
 import numpy as np
-import requests
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple
+from typing import AsyncIterator, List, Dict, Optional, Sequence, Tuple
 import asyncio
 import aiohttp
+import concurrent.futures
+import functools
 import logging
-from dataclasses import dataclass
-from config import trading_config, api_config, WATCHLIST_SYMBOLS
+import orjson
+import time
+from config import trading_config, get_api_config, TradingConfig, WATCHLIST_SYMBOLS
+from cache import cache
+from models import StockData
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-@dataclass
-class StockData:
-    """Stock data container"""
-    symbol: str
-    current_price: float
-    previous_close: float
-    premarket_price: float = None
-    premarket_volume: int = 0
-    regular_volume: int = 0
-    avg_volume: float = 0
-    gap_percent: float = 0
-    market_cap: float = 0
-    timestamp: datetime = None
+class TokenBucket:
+    """Async token-bucket rate limiter"""
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self) -> None:
+        """Wait until a token is available, then consume it"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+    
+    def pause(self, seconds: float) -> None:
+        """Hold off every acquirer for the given number of seconds"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+# Symbols analyzed on each run with the global config, sliced once at import
+_ACTIVE_SYMBOLS = WATCHLIST_SYMBOLS[:trading_config.max_stocks_to_analyze]
+
+@functools.cache
+def _yf_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """Executor for blocking yfinance calls so they never stall the event loop (created on first use)"""
+    return concurrent.futures.ThreadPoolExecutor(
+        max_workers=get_api_config().max_concurrent_requests,
+        thread_name_prefix='yfinance'
+    )
+
+# Process-wide Ticker instances, reused across fetches
+_TICKER_CACHE: Dict[str, yf.Ticker] = {}
+
+def _ticker(symbol: str) -> yf.Ticker:
+    """Return a memoized yfinance Ticker for symbol"""
+    ticker = _TICKER_CACHE.get(symbol)
+    if ticker is None:
+        ticker = _TICKER_CACHE[symbol] = yf.Ticker(symbol)
+    return ticker
+
+# Numeric columns of the symbol-indexed stock frame (all float64)
+STOCK_COLUMNS = [
+    'current_price', 'previous_close', 'premarket_price', 'premarket_volume',
+    'regular_volume', 'avg_volume', 'gap_percent', 'market_cap'
+]
+
+def _empty_stock_frame() -> pd.DataFrame:
+    """Return a stock frame with no rows"""
+    frame = pd.DataFrame({column: pd.Series(dtype=np.float64) for column in STOCK_COLUMNS})
+    frame['timestamp'] = pd.Series(dtype='datetime64[ns]')
+    frame.index.name = 'symbol'
+    return frame
+
+def to_stock_data(frame: pd.DataFrame) -> Dict[str, StockData]:
+    """Materialize StockData views for callers that work per symbol"""
+    # Convert whole columns to Python scalars at once rather than casting field by field
+    premarket_price = frame['premarket_price'].to_numpy(dtype=np.float64)
+    columns = zip(
+        frame.index,
+        frame['current_price'].to_numpy(dtype=np.float64).tolist(),
+        frame['previous_close'].to_numpy(dtype=np.float64).tolist(),
+        np.where(np.isnan(premarket_price), None, premarket_price).tolist(),
+        frame['premarket_volume'].to_numpy(dtype=np.int64).tolist(),
+        frame['regular_volume'].to_numpy(dtype=np.int64).tolist(),
+        frame['avg_volume'].to_numpy(dtype=np.float64).tolist(),
+        frame['gap_percent'].to_numpy(dtype=np.float64).tolist(),
+        frame['market_cap'].to_numpy(dtype=np.float64).tolist(),
+        pd.DatetimeIndex(frame['timestamp']).to_pydatetime().tolist()  # Series.dt.to_pydatetime warns on pandas 2.1+
+    )
+    return {values[0]: StockData(*values) for values in columns}
 
 class PremarketDataFetcher:
     """Fetches premarket and regular market stock data"""
     
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+        config = get_api_config()
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Cap in-flight Yahoo requests to avoid rate limits and socket exhaustion
+        self._sem = asyncio.Semaphore(config.max_concurrent_requests)
+        self._rate_limiter = TokenBucket(config.requests_per_second)
+    
+    async def __aenter__(self) -> "PremarketDataFetcher":
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the shared HTTP session, creating it on first use"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=get_api_config().max_concurrent_requests,
+                limit_per_host=get_api_config().max_concurrent_requests,
+                ttl_dns_cache=300,
+                keepalive_timeout=75,
+                enable_cleanup_closed=True
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={
+                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+                    'Accept-Encoding': 'gzip'
+                }
+            )
+        return self._session
+    
+    async def close(self) -> None:
+        """Close the shared HTTP session"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
     
-    async def get_premarket_data(self, symbols: List[str]) -> Dict[str, StockData]:
+    async def get_premarket_data(self, symbols: List[str]) -> pd.DataFrame:
         """
         Fetch premarket data for multiple symbols
+        Returns a symbol-indexed frame with STOCK_COLUMNS plus a timestamp column
         """
-        results = {}
-        
-        # Use yfinance for basic data
-        if api_config.use_yfinance:
-            yf_data = await self._fetch_yfinance_data(symbols)
-            results.update(yf_data)
+        # Fetch basic data (yfinance) and premarket data (Yahoo Finance API) concurrently
+        if get_api_config().use_yfinance:
+            results, premarket_data = await asyncio.gather(
+                self._fetch_yfinance_data(symbols),
+                self._fetch_yahoo_premarket_data(symbols)
+            )
+        else:
+            results = _empty_stock_frame()
+            premarket_data = await self._fetch_yahoo_premarket_data(symbols)
         
-        # Get additional premarket data from Yahoo Finance API
-        premarket_data = await self._fetch_yahoo_premarket_data(symbols)
-        
-        # Merge premarket data
-        for symbol, pm_data in premarket_data.items():
-            if symbol in results:
-                results[symbol].premarket_price = pm_data.get('premarket_price')
-                results[symbol].premarket_volume = pm_data.get('premarket_volume', 0)
+        # Merge premarket data (aligned on symbol; missing values keep the defaults)
+        if premarket_data and not results.empty:
+            premarket_frame = pd.DataFrame.from_dict(
+                premarket_data, orient='index', columns=['premarket_price', 'premarket_volume']
+            ).astype(np.float64)
+            results.update(premarket_frame)
         
         return results
     
-    async def _fetch_yfinance_data(self, symbols: List[str]) -> Dict[str, StockData]:
-        """Fetch basic stock data using yfinance"""
-        results = {}
+    async def _fetch_yfinance_data(self, symbols: List[str]) -> pd.DataFrame:
+        """Fetch basic stock data using a single batched yfinance download"""
+        results = _empty_stock_frame()
         
         try:
-            # Fetch data in chunks to avoid rate limits
-            chunk_size = 10
-            for i in range(0, len(symbols), chunk_size):
-                chunk = symbols[i:i + chunk_size]
-                tickers = yf.Tickers(' '.join(chunk))
-                
-                for symbol in chunk:
-                    try:
-                        ticker = tickers.tickers[symbol]
-                        info = ticker.info
-                        hist = ticker.history(period="5d", interval="1d")
-                        
-                        if not hist.empty and info:
-                            current_price = info.get('currentPrice', hist['Close'].iloc[-1])
-                            previous_close = info.get('previousClose', hist['Close'].iloc[-2] if len(hist) > 1 else current_price)
-                            
-                            stock_data = StockData(
-                                symbol=symbol,
-                                current_price=float(current_price),
-                                previous_close=float(previous_close),
-                                regular_volume=int(info.get('volume', 0)),
-                                avg_volume=float(info.get('averageVolume', 0)),
-                                market_cap=float(info.get('marketCap', 0)),
-                                timestamp=datetime.now()
-                            )
-                            
-                            # Calculate gap percentage
-                            if previous_close > 0:
-                                stock_data.gap_percent = ((current_price - previous_close) / previous_close) * 100
-                            
-                            results[symbol] = stock_data
-                            
-                    except Exception as e:
-                        logger.warning(f"Error fetching yfinance data for {symbol}: {e}")
-                        continue
+            loop = asyncio.get_running_loop()
+            
+            # One batched download for the daily history of every symbol
+            history_params = {'symbols': list(symbols), 'period': '5d', 'interval': '1d'}
+            history = cache.get_frame('yf_history:batch', get_api_config().history_cache_ttl, history_params)
+            
+            if history is None:
+                # Batches and fetches may download at the same time; yfinance keeps
+                # download() state per call from 1.4.0 (older releases share globals)
+                #
+                # download() sends one request per symbol from its own threads, outside the
+                # bucket and self._sem. Pay a token per symbol up front so the average rate
+                # holds, and cap its threads at max_concurrent_requests; the requests
+                # themselves still go out as one burst rather than being spaced out.
+                for _ in symbols:
+                    await self._rate_limiter.acquire()
+                threads = get_api_config().max_concurrent_requests
+                history = await loop.run_in_executor(
+                    _yf_executor(),
+                    lambda: yf.download(
+                        symbols, period='5d', interval='1d', group_by='ticker',
+                        threads=threads, progress=False, multi_level_index=True
+                    )
+                )
                 
-                # Rate limiting
-                await asyncio.sleep(0.1)
+                if history is None or history.empty:
+                    return results
                 
+                await cache.set_frame_async('yf_history:batch', history, history_params)
+            
+            # Latest and prior close per symbol, skipping missing bars.
+            # Columns are (Ticker, Price) even for a single symbol (multi_level_index=True)
+            closes = history.xs('Close', axis=1, level=1)
+            valid = closes.notna()
+            bars_remaining = valid.iloc[::-1].cumsum().iloc[::-1]
+            latest = valid & (bars_remaining == 1)
+            
+            current = closes.where(latest).max().dropna()
+            prev = closes.where(valid & (bars_remaining == 2)).max().reindex(current.index)
+            prev = prev.fillna(current)
+            volume = history.xs('Volume', axis=1, level=1).where(latest).max().reindex(current.index).fillna(0)
+            
+            # Calculate gap percentage
+            gap = ((current - prev) / prev * 100.0).where(prev > 0, 0.0)
+            
+            infos = await asyncio.gather(*(self._get_fast_info(symbol) for symbol in current.index))
+            
+            results = pd.DataFrame(
+                {
+                    'current_price': current,
+                    'previous_close': prev,
+                    'premarket_price': np.nan,
+                    'premarket_volume': 0.0,
+                    'regular_volume': volume,
+                    'avg_volume': [info.get('avg_volume', 0.0) for info in infos],
+                    'gap_percent': gap,
+                    'market_cap': [info.get('market_cap', 0.0) for info in infos]
+                },
+                columns=STOCK_COLUMNS,
+                dtype=np.float64
+            )
+            results['timestamp'] = pd.Timestamp(datetime.now())
+            results.index.name = 'symbol'
+            
         except Exception as e:
             logger.error(f"Error in yfinance data fetch: {e}")
         
         return results
     
+    async def _get_fast_info(self, symbol: str) -> Dict:
+        """Get average volume and market cap from yfinance fast_info"""
+        cache_key = f"yf_info:{symbol}"
+        info = cache.get(cache_key, get_api_config().info_cache_ttl)
+        if info is not None:
+            return info
+        
+        try:
+            async with self._sem:
+                await self._rate_limiter.acquire()
+                loop = asyncio.get_running_loop()
+                info = await loop.run_in_executor(_yf_executor(), self._read_fast_info, symbol)
+            
+            await cache.set_async(cache_key, info)
+            return info
+        except Exception as e:
+            logger.warning(f"Error fetching yfinance info for {symbol}: {e}")
+        
+        return {}
+    
+    @staticmethod
+    def _read_fast_info(symbol: str) -> Dict:
+        """Read fast_info fields for a symbol (blocking)"""
+        fast_info = _ticker(symbol).fast_info
+        return {
+            'avg_volume': float(fast_info.three_month_average_volume or 0),
+            'market_cap': float(fast_info.market_cap or 0)
+        }
+    
     async def _fetch_yahoo_premarket_data(self, symbols: List[str]) -> Dict[str, Dict]:
         """Fetch premarket data from Yahoo Finance API"""
         results = {}
+        session = self._get_session()
         
-        async with aiohttp.ClientSession() as session:
-            tasks = []
-            for symbol in symbols:
-                task = self._get_yahoo_quote(session, symbol)
-                tasks.append(task)
-            
-            responses = await asyncio.gather(*tasks, return_exceptions=True)
+        tasks = [self._get_yahoo_quote(session, symbol) for symbol in symbols]
+        
+        # Merge each quote as soon as it lands rather than waiting for the whole batch
+        timeouts = 0
+        for next_quote in asyncio.as_completed(tasks):
+            try:
+                symbol, quote = await next_quote
+            except asyncio.TimeoutError:
+                timeouts += 1
+                continue
+            except Exception as e:
+                logger.warning(f"Error fetching Yahoo premarket data: {e}")
+                continue
             
-            for symbol, response in zip(symbols, responses):
-                if isinstance(response, dict):
-                    results[symbol] = response
+            if quote:
+                results[symbol] = quote
+        
+        if timeouts:
+            logger.warning(f"Yahoo premarket request timed out for {timeouts} of {len(symbols)} symbols")
         
         return results
     
-    async def _get_yahoo_quote(self, session: aiohttp.ClientSession, symbol: str) -> Dict:
-        """Get quote data from Yahoo Finance API"""
+    async def _get_yahoo_quote(self, session: aiohttp.ClientSession, symbol: str) -> Tuple[str, Dict]:
+        """Get quote data from Yahoo Finance API, returned alongside its symbol"""
+        cache_key = f"yahoo_quote:{symbol}"
+        cached = cache.get(cache_key, get_api_config().quote_cache_ttl)
+        if cached is not None:
+            return symbol, cached
+        
         try:
             url = f"https://query1.finance.yahoo.com/v8/finance/chart/{symbol}"
             params = {
                 'region': 'US',
                 'lang': 'en-US',
                 'includePrePost': 'true',
-                'interval': '1m',
+                'interval': '1d',  # Only meta is read, so skip the per-minute bars
                 'range': '1d'
             }
             
-            async with session.get(url, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
+            config = get_api_config()
+            for attempt in range(config.max_retries + 1):
+                async with self._sem:
+                    await self._rate_limiter.acquire()
+                    # Time out the request itself, not the wait for a semaphore slot
+                    status, headers, data = await asyncio.wait_for(
+                        self._request_json(session, url, params),
+                        timeout=config.quote_timeout
+                    )
+                
+                # Back off when Yahoo tells us we're being throttled
+                if status == 429 or headers.get('X-RateLimit-Remaining') == '0':
+                    self._rate_limiter.pause(self._retry_delay(headers, attempt))
+                
+                if status == 429:
+                    continue
+                
+                if status == 200:
                     chart_data = data.get('chart', {}).get('result', [])
                     
                     if chart_data:
@@ -151,64 +343,131 @@ class PremarketDataFetcher:
                         premarket_price = meta.get('regularMarketPrice')
                         premarket_volume = meta.get('regularMarketVolume', 0)
                         
-                        return {
+                        quote = {
                             'premarket_price': premarket_price,
                             'premarket_volume': premarket_volume
                         }
+                        await cache.set_async(cache_key, quote)
+                        return symbol, quote
+                break
+        except asyncio.TimeoutError:
+            # Reported once per batch by _fetch_yahoo_premarket_data
+            raise
         except Exception as e:
             logger.warning(f"Error fetching Yahoo premarket data for {symbol}: {e}")
         
-        return {}
+        return symbol, {}
+    
+    @staticmethod
+    async def _request_json(session: aiohttp.ClientSession, url: str, params: Dict) -> Tuple[int, Dict, Optional[Dict]]:
+        """GET url and return (status, headers, decoded JSON body if status is 200)"""
+        async with session.get(url, params=params) as response:
+            data = orjson.loads(await response.read()) if response.status == 200 else None
+            return response.status, response.headers, data
     
-    def get_most_active_premarket(self) -> List[str]:
+    @staticmethod
+    def _retry_delay(headers, attempt: int) -> float:
+        """Seconds to wait before retrying: Retry-After if given, else exponential backoff"""
+        retry_after = headers.get('Retry-After')
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return get_api_config().retry_backoff_seconds * (2 ** attempt)
+    
+    def get_most_active_premarket(self, config: Optional[TradingConfig] = None) -> Tuple[str, ...]:
         """
         Get most active premarket stocks
-        For now, returns the watchlist but could be enhanced with real-time data
+        For now, returns the watchlist (capped at config.max_stocks_to_analyze) but
+        could be enhanced with real-time data
         """
         try:
             # This could be enhanced to fetch real most active stocks
             # For now, we'll use our predefined watchlist
-            return WATCHLIST_SYMBOLS[:trading_config.max_stocks_to_analyze]
+            if config is None:
+                return _ACTIVE_SYMBOLS
+            return WATCHLIST_SYMBOLS[:config.max_stocks_to_analyze]
         except Exception as e:
             logger.error(f"Error getting most active premarket stocks: {e}")
             return WATCHLIST_SYMBOLS[:20]  # Fallback to first 20
     
-    def filter_stocks_by_criteria(self, stock_data: Dict[str, StockData]) -> Dict[str, StockData]:
-        """Filter stocks based on trading criteria"""
-        filtered = {}
+    def filter_stocks_by_criteria(self, stock_data: pd.DataFrame,
+                                  config: Optional[TradingConfig] = None) -> pd.DataFrame:
+        """Filter stocks based on trading criteria (the global trading_config unless given)"""
+        if stock_data.empty:
+            return stock_data
         
-        for symbol, data in stock_data.items():
-            # Price filter
-            if data.current_price < trading_config.min_price or data.current_price > trading_config.max_price:
-                continue
-            
-            # Volume filter (must have some volume)
-            if data.regular_volume == 0 and data.premarket_volume == 0:
-                continue
-            
-            # Gap filter (absolute value)
-            if abs(data.gap_percent) < 1.0:  # At least 1% gap
-                continue
-            
-            filtered[symbol] = data
+        config = config or trading_config
+        
+        # Price filter
+        mask = stock_data.current_price.between(config.min_price, config.max_price)
         
-        return filtered
+        # Volume filter (must have some volume)
+        mask &= (stock_data.regular_volume != 0) | (stock_data.premarket_volume != 0)
+        
+        # Gap filter (absolute value) - at least 1% gap
+        mask &= stock_data.gap_percent.abs() >= 1.0
+        
+        return stock_data[mask]
 
-# Async helper function for easy usage
-async def fetch_premarket_stocks() -> Dict[str, StockData]:
-    """Main function to fetch and filter premarket stock data"""
-    fetcher = PremarketDataFetcher()
+# Async helper functions for easy usage
+async def stream_premarket_frames(symbols: Optional[Sequence[str]] = None,
+                                  fetcher: Optional[PremarketDataFetcher] = None,
+                                  batch_size: int = 50,
+                                  config: Optional[TradingConfig] = None) -> AsyncIterator[pd.DataFrame]:
+    """
+    Fetch and filter premarket stock data in batches, yielding each batch's stock frame as it is ready
+    All batches are requested up front (the fetcher's limits still apply) and yielded in
+    symbol order, so callers can analyze one batch while later ones are still downloading.
+    config sets the price filter and default symbol count (the global trading_config if omitted).
+    """
+    if fetcher is None:
+        async with PremarketDataFetcher() as fetcher:
+            async for frame in stream_premarket_frames(symbols, fetcher, batch_size, config):
+                yield frame
+        return
     
     # Get most active stocks
-    symbols = fetcher.get_most_active_premarket()
+    symbols = list(symbols or fetcher.get_most_active_premarket(config))
     logger.info(f"Fetching data for {len(symbols)} symbols")
     
-    # Fetch data
-    stock_data = await fetcher.get_premarket_data(symbols)
-    logger.info(f"Retrieved data for {len(stock_data)} stocks")
-    
-    # Filter based on criteria
-    filtered_data = fetcher.filter_stocks_by_criteria(stock_data)
-    logger.info(f"Filtered to {len(filtered_data)} stocks meeting criteria")
-    
-    return filtered_data
\ No newline at end of file
+    tasks = [
+        asyncio.ensure_future(fetcher.get_premarket_data(symbols[start:start + batch_size]))
+        for start in range(0, len(symbols), batch_size)
+    ]
+    try:
+        for task in tasks:
+            stock_data = await task
+            
+            # Filter based on criteria
+            filtered_data = fetcher.filter_stocks_by_criteria(stock_data, config)
+            logger.info(f"Retrieved data for {len(stock_data)} stocks, {len(filtered_data)} meeting criteria")
+            
+            yield filtered_data
+    finally:
+        # Stop outstanding downloads if the consumer bails out early
+        for task in tasks:
+            task.cancel()
+
+async def stream_premarket_stocks(symbols: Optional[Sequence[str]] = None,
+                                  fetcher: Optional[PremarketDataFetcher] = None,
+                                  batch_size: int = 50,
+                                  config: Optional[TradingConfig] = None) -> AsyncIterator[Dict[str, StockData]]:
+    """Like stream_premarket_frames, but yields each batch as StockData objects keyed by symbol"""
+    async for frame in stream_premarket_frames(symbols, fetcher, batch_size, config):
+        yield to_stock_data(frame)
+
+async def fetch_premarket_stocks(symbols: Optional[Sequence[str]] = None,
+                                 fetcher: Optional[PremarketDataFetcher] = None,
+                                 config: Optional[TradingConfig] = None) -> Dict[str, StockData]:
+    """
+    Main function to fetch and filter premarket stock data
+    Uses the most active premarket stocks unless symbols are given. Pass a
+    long-lived fetcher to reuse its connections; otherwise one is opened
+    and closed for this call. config overrides the global trading_config filters.
+    """
+    stock_data = {}
+    async for batch in stream_premarket_stocks(symbols, fetcher, config=config):
+        stock_data.update(batch)
+    return stock_data
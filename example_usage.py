@@ -4,19 +4,35 @@ Example usage of the Signals Bot
 This script demonstrates how to use the signals bot with different configurations
 """
 import asyncio
-import json
 from datetime import datetime
-from signals_bot import SignalsBot
-from config import trading_config, TradingConfig
+from typing import Dict, List, Optional
+from signals_bot import SignalsBot, save_result
+from data_fetcher import fetch_premarket_stocks, PremarketDataFetcher
+from models import StockData
+from config import TradingConfig
 
-async def basic_example():
+# Custom tech-focused watchlist
+TECH_WATCHLIST = [
+    'AAPL', 'MSFT', 'GOOGL', 'AMZN', 'TSLA', 'NVDA', 'META', 'NFLX',
+    'CRM', 'ADBE', 'ORCL', 'INTC', 'AMD', 'SNOW', 'PLTR', 'SQ',
+    'PYPL', 'SHOP', 'ZM', 'DOCU', 'OKTA', 'TWLO', 'DDOG', 'NET'
+]
+
+async def _run_bot(bot: SignalsBot, stock_data: Optional[Dict[str, StockData]] = None,
+                   symbols: Optional[List[str]] = None) -> Dict:
+    """Analyze pre-fetched stock data when given, otherwise fetch fresh data"""
+    if stock_data is None:
+        return await bot.run_analysis(symbols)
+    return await asyncio.to_thread(bot.analyze, stock_data)
+
+async def basic_example(stock_data: Optional[Dict[str, StockData]] = None):
     """Basic example - run the bot with default settings"""
     print("=" * 60)
     print("BASIC EXAMPLE - Default Settings")
     print("=" * 60)
     
     bot = SignalsBot()
-    result = await bot.run_analysis()
+    result = await _run_bot(bot, stock_data)
     
     # Print formatted report
     report = bot.format_signals_report(result)
@@ -24,7 +40,7 @@ async def basic_example():
     
     return result
 
-async def conservative_example():
+async def conservative_example(stock_data: Optional[Dict[str, StockData]] = None):
     """Conservative trading example with tighter risk management"""
     print("\n" + "=" * 60)
     print("CONSERVATIVE EXAMPLE - Tight Risk Management")
@@ -39,24 +55,15 @@ async def conservative_example():
         volume_threshold_multiplier=3.0,  # Higher volume requirement
     )
     
-    # Temporarily override global config
-    original_config = trading_config
-    import config
-    config.trading_config = conservative_config
+    bot = SignalsBot(conservative_config)
+    result = await _run_bot(bot, stock_data)
     
-    try:
-        bot = SignalsBot()
-        result = await bot.run_analysis()
-        
-        report = bot.format_signals_report(result)
-        print(report)
-        
-        return result
-    finally:
-        # Restore original config
-        config.trading_config = original_config
+    report = bot.format_signals_report(result)
+    print(report)
+    
+    return result
 
-async def aggressive_example():
+async def aggressive_example(stock_data: Optional[Dict[str, StockData]] = None):
     """Aggressive trading example with looser risk management"""
     print("\n" + "=" * 60)
     print("AGGRESSIVE EXAMPLE - Higher Risk/Reward")
@@ -71,56 +78,27 @@ async def aggressive_example():
         volume_threshold_multiplier=1.5,  # Lower volume requirement
     )
     
-    # Temporarily override global config
-    original_config = trading_config
-    import config
-    config.trading_config = aggressive_config
+    bot = SignalsBot(aggressive_config)
+    result = await _run_bot(bot, stock_data)
     
-    try:
-        bot = SignalsBot()
-        result = await bot.run_analysis()
-        
-        report = bot.format_signals_report(result)
-        print(report)
-        
-        return result
-    finally:
-        # Restore original config
-        config.trading_config = original_config
+    report = bot.format_signals_report(result)
+    print(report)
+    
+    return result
 
-async def custom_watchlist_example():
+async def custom_watchlist_example(stock_data: Optional[Dict[str, StockData]] = None):
     """Example with custom watchlist of specific stocks"""
     print("\n" + "=" * 60)
     print("CUSTOM WATCHLIST EXAMPLE - Tech Stocks Only")
     print("=" * 60)
     
-    # Override the watchlist temporarily
-    original_watchlist = None
-    try:
-        import config
-        original_watchlist = config.WATCHLIST_SYMBOLS
-        
-        # Custom tech-focused watchlist
-        tech_watchlist = [
-            'AAPL', 'MSFT', 'GOOGL', 'AMZN', 'TSLA', 'NVDA', 'META', 'NFLX',
-            'CRM', 'ADBE', 'ORCL', 'INTC', 'AMD', 'SNOW', 'PLTR', 'SQ',
-            'PYPL', 'SHOP', 'ZM', 'DOCU', 'OKTA', 'TWLO', 'DDOG', 'NET'
-        ]
-        
-        config.WATCHLIST_SYMBOLS = tech_watchlist
-        
-        bot = SignalsBot()
-        result = await bot.run_analysis()
-        
-        report = bot.format_signals_report(result)
-        print(report)
-        
-        return result
-        
-    finally:
-        if original_watchlist:
-            import config
-            config.WATCHLIST_SYMBOLS = original_watchlist
+    bot = SignalsBot()
+    result = await _run_bot(bot, stock_data, TECH_WATCHLIST)
+    
+    report = bot.format_signals_report(result)
+    print(report)
+    
+    return result
 
 def analyze_results(results):
     """Analyze and compare results from different strategies"""
@@ -153,35 +131,35 @@ async def schedule_example():
     print("=" * 60)
     print("Running signals bot every 5 minutes... (Press Ctrl+C to stop)")
     
-    bot = SignalsBot()
     run_count = 0
     
     try:
-        while True:
-            run_count += 1
-            print(f"\n--- Run #{run_count} at {datetime.now().strftime('%H:%M:%S')} ---")
-            
-            result = await bot.run_analysis()
-            
-            # Quick summary
-            summary = result['summary']
-            print(f"Found {summary['signals_generated']} signals from {summary['total_stocks_analyzed']} stocks")
-            
-            if result['signals']:
-                top_signal = result['signals'][0]
-                print(f"Top signal: {top_signal['symbol']} ({top_signal['confidence']:.1%} confidence)")
-            
-            # Save timestamped results
-            filename = f"scheduled_signals_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            with open(filename, 'w') as f:
-                json.dump(result, f, indent=2)
-            
-            print(f"Results saved to {filename}")
-            
-            # Wait 5 minutes
-            print("Waiting 5 minutes for next run...")
-            await asyncio.sleep(300)  # 5 minutes
-            
+        # One bot for the whole loop so HTTP connections and caches are reused
+        async with SignalsBot() as bot:
+            while True:
+                run_count += 1
+                print(f"\n--- Run #{run_count} at {datetime.now().strftime('%H:%M:%S')} ---")
+                
+                result = await bot.run_analysis()
+                
+                # Quick summary
+                summary = result['summary']
+                print(f"Found {summary['signals_generated']} signals from {summary['total_stocks_analyzed']} stocks")
+                
+                if result['signals']:
+                    top_signal = result['signals'][0]
+                    print(f"Top signal: {top_signal['symbol']} ({top_signal['confidence']:.1%} confidence)")
+                
+                # Save timestamped results
+                filename = f"scheduled_signals_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+                save_result(result, filename)
+                
+                print(f"Results saved to {filename}")
+                
+                # Wait 5 minutes
+                print("Waiting 5 minutes for next run...")
+                await asyncio.sleep(300)  # 5 minutes
+                
     except KeyboardInterrupt:
         print(f"\nScheduled runs stopped. Completed {run_count} runs.")
 
@@ -195,11 +173,19 @@ async def main():
     results = {}
     
     try:
+        # Fetch each watchlist once (concurrently) and share the data across examples.
+        # Both fetches go through one fetcher so a single rate limit and connection pool apply
+        async with PremarketDataFetcher() as fetcher:
+            stock_data, tech_stock_data = await asyncio.gather(
+                fetch_premarket_stocks(fetcher=fetcher),
+                fetch_premarket_stocks(TECH_WATCHLIST, fetcher=fetcher)
+            )
+        
         # Run different examples
-        results['Basic'] = await basic_example()
-        results['Conservative'] = await conservative_example()
-        results['Aggressive'] = await aggressive_example()
-        results['Tech Watchlist'] = await custom_watchlist_example()
+        results['Basic'] = await basic_example(stock_data)
+        results['Conservative'] = await conservative_example(stock_data)
+        results['Aggressive'] = await aggressive_example(stock_data)
+        results['Tech Watchlist'] = await custom_watchlist_example(tech_stock_data)
         
         # Analyze results
         analyze_results(results)
@@ -0,0 +1,19 @@
+"""
+Data containers shared by the fetcher, strategies and bot
+"""
+from dataclasses import dataclass
+from datetime import datetime
+
+@dataclass(slots=True)
+class StockData:
+    """Stock data container (a per-symbol view of the stock frame)"""
+    symbol: str
+    current_price: float
+    previous_close: float
+    premarket_price: float = None
+    premarket_volume: int = 0
+    regular_volume: int = 0
+    avg_volume: float = 0
+    gap_percent: float = 0
+    market_cap: float = 0
+    timestamp: datetime = None
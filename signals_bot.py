@@ -1,17 +1,26 @@
 """
 Main Signals Bot - Generates trading signals from premarket data
 """
+import argparse
 import asyncio
+import heapq
+import itertools
+import numpy as np
 import pandas as pd
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Dict, Iterator, List, Optional, Union
 import logging
-import json
-from dataclasses import asdict
+import sys
+import time
+from operator import itemgetter
+import orjson
+from dataclasses import dataclass
+from functools import cached_property
 
-from data_fetcher import fetch_premarket_stocks, StockData
-from strategies import StrategyManager, StrategySignal
-from config import trading_config
+from data_fetcher import stream_premarket_frames, PremarketDataFetcher
+from models import StockData
+from strategies import StrategyManager, StockPanel
+from config import trading_config, TradingConfig
 
 # Set up logging
 logging.basicConfig(
@@ -20,150 +29,249 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Report section templates
+_RULE = "=" * 80
+
+HEADER_FMT = (
+    _RULE + "\n"
+    "               PREMARKET TRADING SIGNALS REPORT\n"
+    + _RULE + "\n"
+    "Generated: {timestamp}\n"
+    "Analysis Duration: {analysis_duration_seconds:.1f} seconds"
+)
+
+SUMMARY_FMT = (
+    "SUMMARY:\n"
+    "  • Total Stocks Analyzed: {total_stocks_analyzed}\n"
+    "  • Signals Generated: {signals_generated}"
+)
+
+SUMMARY_STATS_FMT = (
+    "  • Average Confidence: {avg_confidence:.1%}\n"
+    "  • Average Risk:Reward: {avg_risk_reward}:1\n"
+    "  • Buy Signals: {buy_signals}\n"
+    "  • Sell Signals: {sell_signals}\n"
+    "  • Total Risk Amount: ${total_risk_amount:,.2f}\n"
+    "  • Total Position Value: ${total_position_value:,.2f}"
+)
+
+SIGNALS_HEADER = "TOP TRADING SIGNALS:\n" + "-" * 80
+
+SIGNAL_FMT = (
+    "\n{i}. {symbol} - {strategy} Strategy\n"
+    "   Signal: {signal_type} | Confidence: {confidence:.1%}\n"
+    "   Current Price: ${current_price:.2f} | Gap: {gap_percent:+.1f}%\n"
+    "   Entry: ${entry_price:.2f} | Stop: ${stop_loss:.2f} | Target: ${take_profit:.2f}\n"
+    "   Risk:Reward: {risk_reward_ratio}:1\n"
+    "   Position: {shares} shares (${position_value:,.2f})\n"
+    "   Risk: ${risk_amount:,.2f} | Potential Profit: ${potential_profit:,.2f}\n"
+    "   Volume: {volume_ratio:.1f}x normal\n"
+    "   Reasoning: {reasoning}"
+)
+
+FOOTER = (
+    "\n" + _RULE + "\n"
+    "DISCLAIMER: This is for educational purposes only. Always do your own research.\n"
+    + _RULE
+)
+
+# Result signal layout: flat fields, then the nested position_sizing and volume_info groups
+_SIGNAL_FIELDS = (
+    'symbol', 'strategy', 'signal_type', 'confidence', 'current_price', 'entry_price',
+    'stop_loss', 'take_profit', 'risk_reward_ratio', 'gap_percent', 'reasoning'
+)
+_POSITION_FIELDS = ('shares', 'position_value', 'position_percent', 'risk_amount', 'potential_profit', 'potential_loss')
+_VOLUME_FIELDS = ('current_volume', 'avg_volume', 'volume_ratio')
+
+# Decimal places per result column
+_RESULT_ROUNDING = {
+    'confidence': 3, 'current_price': 2, 'entry_price': 2, 'stop_loss': 2, 'take_profit': 2,
+    'risk_reward_ratio': 2, 'gap_percent': 2, 'position_value': 2, 'position_percent': 1,
+    'risk_amount': 2, 'potential_profit': 2, 'potential_loss': 2, 'volume_ratio': 2
+}
+
+def _pick_rounded(record: Dict, fields: tuple) -> Dict:
+    """Take fields from a result record, rounding them with Python round()"""
+    # Not DataFrame.round: its scale-and-rint rounding differs at half-cent values (12.345 -> 12.34)
+    return {
+        field: round(record[field], _RESULT_ROUNDING[field]) if field in _RESULT_ROUNDING else record[field]
+        for field in fields
+    }
+
+def _flatten_signal(signal: Dict, i: int) -> Dict:
+    """Merge a result signal with its nested sizing/volume info for SIGNAL_FMT"""
+    return signal | signal['position_sizing'] | signal['volume_info'] | {'i': i}
+
 class SignalsBot:
     """Main signals bot class"""
     
-    def __init__(self):
-        self.strategy_manager = StrategyManager()
+    def __init__(self, config: Optional[TradingConfig] = None):
+        self.config = config or trading_config
+        self.strategy_manager = StrategyManager(self.config)
+        self.fetcher: Optional[PremarketDataFetcher] = None
         self.last_run_time = None
+    
+    async def __aenter__(self) -> "SignalsBot":
+        # Keep one fetcher (and its HTTP connections) alive across runs
+        self.fetcher = PremarketDataFetcher()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if self.fetcher is not None:
+            await self.fetcher.close()
+            self.fetcher = None
         
-    async def run_analysis(self) -> Dict:
+    async def run_analysis(self, symbols: Optional[List[str]] = None) -> Dict:
         """Run complete analysis and return trading signals"""
         logger.info("Starting signals bot analysis...")
-        start_time = datetime.now()
+        start_time = time.monotonic()
+        heap = []
+        tiebreak = itertools.count()
+        total_stocks = 0
         
         try:
-            # Fetch premarket stock data
+            # Analyze each batch of premarket stock data while later batches are still fetching.
+            # The panel analysis is CPU-bound; run it in a worker thread so the event loop
+            # stays responsive (and keeps downloading) during large universe scans
             logger.info("Fetching premarket stock data...")
-            stock_data = await fetch_premarket_stocks()
+            async for frame in stream_premarket_frames(symbols, self.fetcher, config=self.config):
+                if not frame.empty:
+                    total_stocks += len(frame)
+                    panel = StockPanel.from_frame(frame)
+                    await asyncio.to_thread(self._collect_candidates, panel, heap, tiebreak)
             
-            if not stock_data:
+            if not total_stocks:
                 logger.warning("No stock data retrieved")
                 return self._create_empty_result("No stock data available")
             
-            logger.info(f"Analyzing {len(stock_data)} stocks for signals...")
-            
-            # Analyze stocks and generate signals
-            all_signals = []
-            for symbol, data in stock_data.items():
-                signals = self.strategy_manager.analyze_stock(data)
-                if signals:
-                    # Get best signal for this stock
-                    best_signal = self.strategy_manager.get_best_signal(signals)
-                    if best_signal:
-                        # Add position sizing information
-                        position_info = self._calculate_position_info(best_signal, data)
-                        all_signals.append((best_signal, data, position_info))
+            return self._finish_analysis(heap, total_stocks, start_time)
             
-            # Sort signals by confidence and filter by minimum criteria
-            valid_signals = [
-                (signal, data, position_info) for signal, data, position_info in all_signals
-                if signal.confidence >= 0.4 and signal.risk_reward_ratio >= trading_config.min_risk_reward_ratio
-            ]
-            
-            # Sort by weighted score (confidence * R:R ratio)
-            valid_signals.sort(
-                key=lambda x: x[0].confidence * x[0].risk_reward_ratio, 
-                reverse=True
-            )
-            
-            # Take top signals
-            top_signals = valid_signals[:10]  # Top 10 signals
-            
-            # Create result
-            result = self._create_result(top_signals, stock_data, start_time)
-            
-            logger.info(f"Analysis complete. Found {len(top_signals)} valid signals")
-            self.last_run_time = datetime.now()
+        except Exception as e:
+            logger.error(f"Error in signals bot analysis: {e}")
+            return self._create_empty_result(f"Error: {str(e)}")
+    
+    def analyze(self, stock_data: Dict[str, StockData], start_time: Optional[float] = None) -> Dict:
+        """
+        Generate trading signals from already-fetched stock data
+        Lets several bots (e.g. with different configs) share one fetch
+        """
+        if start_time is None:
+            start_time = time.monotonic()
+        
+        try:
+            if not stock_data:
+                logger.warning("No stock data retrieved")
+                return self._create_empty_result("No stock data available")
             
-            return result
+            heap = []
+            self._collect_candidates(StockPanel.from_stock_data(stock_data.values()), heap, itertools.count())
+            return self._finish_analysis(heap, len(stock_data), start_time)
             
         except Exception as e:
             logger.error(f"Error in signals bot analysis: {e}")
             return self._create_empty_result(f"Error: {str(e)}")
     
-    def _calculate_position_info(self, signal: StrategySignal, stock_data: StockData) -> Dict:
-        """Calculate position sizing and risk information"""
-        account_value = 100000  # $100k account assumption
-        risk_amount = account_value * trading_config.max_risk_per_trade
+    def _collect_candidates(self, panel: StockPanel, heap: List, tiebreak: Iterator[int]) -> None:
+        """
+        Analyze a batch of stocks and fold its signals into the running top-10 heap
+        Signals that pass the minimum criteria are kept in a size-10 min-heap keyed by
+        weighted score (confidence * R:R ratio). The tiebreak is a decreasing counter
+        shared across batches so that, on equal scores, earlier stocks rank first and
+        later ones are evicted first. Entries keep the panel and row of their stock.
+        """
+        logger.info(f"Analyzing {len(panel)} stocks for signals...")
         
-        price_risk = abs(signal.entry_price - signal.stop_loss)
-        if price_risk == 0:
-            return {'shares': 0, 'position_value': 0, 'risk_amount': 0, 'position_percent': 0}
+        min_rr = self.config.min_risk_reward_ratio
+        for i, best_signal in self.strategy_manager.analyze_panel(panel):
+            if best_signal.confidence < 0.4 or best_signal.risk_reward_ratio < min_rr:
+                continue
+            entry = (best_signal.confidence * best_signal.risk_reward_ratio, -next(tiebreak), best_signal, panel, i)
+            if len(heap) < 10:
+                heapq.heappush(heap, entry)
+            else:
+                heapq.heappushpop(heap, entry)
+    
+    def _finish_analysis(self, heap: List, total_stocks: int, start_time: float) -> Dict:
+        """Rank the top-10 heap, size positions and build the result"""
+        ranked = [(signal, panel, i) for _, _, signal, panel, i in sorted(heap, key=itemgetter(0, 1), reverse=True)]
         
-        shares = int(risk_amount / price_risk)
-        position_value = shares * signal.entry_price
-        max_position_value = account_value * trading_config.max_position_size
+        # Add position sizing information for the signals we keep, sized in one vectorized pass
+        sizing = self.strategy_manager.size_positions([signal for signal, _, _ in ranked])
         
-        # Don't exceed max position size
-        if position_value > max_position_value:
-            shares = int(max_position_value / signal.entry_price)
-            position_value = shares * signal.entry_price
+        # Create result
+        end_time = datetime.now()
+        result = self._create_result(ranked, sizing, total_stocks, start_time, end_time)
         
-        return {
-            'shares': shares,
-            'position_value': position_value,
-            'risk_amount': shares * price_risk,
-            'position_percent': (position_value / account_value) * 100,
-            'potential_profit': shares * (signal.take_profit - signal.entry_price),
-            'potential_loss': shares * (signal.entry_price - signal.stop_loss)
-        }
+        logger.info(f"Analysis complete. Found {len(ranked)} valid signals")
+        self.last_run_time = end_time
+        
+        return result
     
-    def _create_result(self, signals_data: List, all_stock_data: Dict, start_time: datetime) -> Dict:
-        """Create formatted result dictionary"""
-        signals_list = []
+    def _create_result(self, ranked: List, sizing: Dict[str, np.ndarray], total_stocks: int,
+                       start_time: float, end_time: Optional[datetime] = None) -> Dict:
+        """
+        Create formatted result dictionary
+        ranked holds (signal, panel, row) triples best first and sizing the matching
+        size_positions() arrays; start_time is a time.monotonic() reading and
+        end_time the wall-clock report timestamp
+        """
         
-        for signal, stock_data, position_info in signals_data:
-            signal_dict = {
-                'symbol': signal.symbol,
-                'strategy': signal.strategy_name,
-                'signal_type': signal.signal_type,
-                'confidence': round(signal.confidence, 3),
-                'current_price': round(stock_data.current_price, 2),
-                'entry_price': round(signal.entry_price, 2),
-                'stop_loss': round(signal.stop_loss, 2),
-                'take_profit': round(signal.take_profit, 2),
-                'risk_reward_ratio': round(signal.risk_reward_ratio, 2),
-                'gap_percent': round(stock_data.gap_percent, 2),
-                'reasoning': signal.reasoning,
-                'position_sizing': {
-                    'shares': position_info['shares'],
-                    'position_value': round(position_info['position_value'], 2),
-                    'position_percent': round(position_info['position_percent'], 1),
-                    'risk_amount': round(position_info['risk_amount'], 2),
-                    'potential_profit': round(position_info['potential_profit'], 2),
-                    'potential_loss': round(position_info['potential_loss'], 2)
-                },
-                'volume_info': {
-                    'current_volume': stock_data.regular_volume + stock_data.premarket_volume,
-                    'avg_volume': int(stock_data.avg_volume),
-                    'volume_ratio': round((stock_data.regular_volume + stock_data.premarket_volume) / max(stock_data.avg_volume, 1), 2)
-                }
+        end_time = end_time or datetime.now()
+        
+        # Build the top signals as one flat table, then round each field while nesting the records
+        frame = pd.DataFrame(
+            [
+                (signal.symbol, signal.strategy_name, signal.signal_type, signal.confidence,
+                 panel.current_price[i], signal.entry_price, signal.stop_loss, signal.take_profit,
+                 signal.risk_reward_ratio, panel.gap_percent[i], signal.reasoning,
+                 int(panel.total_volume[i]), panel.avg_volume[i])
+                for signal, panel, i in ranked
+            ],
+            columns=_SIGNAL_FIELDS + ('current_volume', 'avg_volume')
+        ).assign(**sizing)
+        frame['volume_ratio'] = frame['current_volume'] / frame['avg_volume'].clip(lower=1)
+        frame['avg_volume'] = frame['avg_volume'].astype(np.int64)
+        
+        signals_list = [
+            _pick_rounded(record, _SIGNAL_FIELDS)
+            | {
+                'position_sizing': _pick_rounded(record, _POSITION_FIELDS),
+                'volume_info': _pick_rounded(record, _VOLUME_FIELDS)
             }
-            signals_list.append(signal_dict)
+            for record in frame.to_dict(orient='records')
+        ]
+        
+        # Summary statistics: one pass to gather the columns, one reduction to total them
+        signal_count = len(signals_list)
+        stats = np.array([
+            (s['confidence'], s['risk_reward_ratio'],
+             s['position_sizing']['risk_amount'], s['position_sizing']['position_value'],
+             s['signal_type'] == 'BUY', s['signal_type'] == 'SELL')
+            for s in signals_list
+        ], dtype=np.float64).reshape(signal_count, 6)
+        confidence_total, risk_reward_total, risk_total, position_total, buy_count, sell_count = stats.sum(axis=0).tolist()
         
-        # Summary statistics
         summary = {
-            'total_stocks_analyzed': len(all_stock_data),
-            'signals_generated': len(signals_list),
-            'avg_confidence': round(sum(s['confidence'] for s in signals_list) / len(signals_list), 3) if signals_list else 0,
-            'avg_risk_reward': round(sum(s['risk_reward_ratio'] for s in signals_list) / len(signals_list), 2) if signals_list else 0,
-            'buy_signals': len([s for s in signals_list if s['signal_type'] == 'BUY']),
-            'sell_signals': len([s for s in signals_list if s['signal_type'] == 'SELL']),
-            'total_risk_amount': round(sum(s['position_sizing']['risk_amount'] for s in signals_list), 2),
-            'total_position_value': round(sum(s['position_sizing']['position_value'] for s in signals_list), 2)
+            'total_stocks_analyzed': total_stocks,
+            'signals_generated': signal_count,
+            'avg_confidence': round(confidence_total / signal_count, 3) if signal_count else 0,
+            'avg_risk_reward': round(risk_reward_total / signal_count, 2) if signal_count else 0,
+            'buy_signals': int(buy_count),
+            'sell_signals': int(sell_count),
+            'total_risk_amount': round(risk_total, 2) if signal_count else 0,
+            'total_position_value': round(position_total, 2) if signal_count else 0
         }
         
         return {
-            'timestamp': datetime.now().isoformat(),
-            'analysis_duration_seconds': (datetime.now() - start_time).total_seconds(),
+            'timestamp': end_time.isoformat(),
+            'analysis_duration_seconds': time.monotonic() - start_time,
             'summary': summary,
             'signals': signals_list,
             'config': {
-                'max_risk_per_trade': trading_config.max_risk_per_trade,
-                'min_risk_reward_ratio': trading_config.min_risk_reward_ratio,
-                'gap_threshold_percent': trading_config.gap_threshold_percent,
-                'volume_threshold_multiplier': trading_config.volume_threshold_multiplier
+                'max_risk_per_trade': self.config.max_risk_per_trade,
+                'min_risk_reward_ratio': self.config.min_risk_reward_ratio,
+                'gap_threshold_percent': self.config.gap_threshold_percent,
+                'volume_threshold_multiplier': self.config.volume_threshold_multiplier
             }
         }
     
@@ -179,36 +287,20 @@ class SignalsBot:
             },
             'signals': [],
             'config': {
-                'max_risk_per_trade': trading_config.max_risk_per_trade,
-                'min_risk_reward_ratio': trading_config.min_risk_reward_ratio,
-                'gap_threshold_percent': trading_config.gap_threshold_percent,
-                'volume_threshold_multiplier': trading_config.volume_threshold_multiplier
+                'max_risk_per_trade': self.config.max_risk_per_trade,
+                'min_risk_reward_ratio': self.config.min_risk_reward_ratio,
+                'gap_threshold_percent': self.config.gap_threshold_percent,
+                'volume_threshold_multiplier': self.config.volume_threshold_multiplier
             }
         }
     
     def format_signals_report(self, result: Dict) -> str:
         """Format signals into a readable report"""
-        report = []
-        report.append("=" * 80)
-        report.append("               PREMARKET TRADING SIGNALS REPORT")
-        report.append("=" * 80)
-        report.append(f"Generated: {result['timestamp']}")
-        report.append(f"Analysis Duration: {result['analysis_duration_seconds']:.1f} seconds")
-        report.append("")
-        
-        # Summary
         summary = result['summary']
-        report.append("SUMMARY:")
-        report.append(f"  • Total Stocks Analyzed: {summary['total_stocks_analyzed']}")
-        report.append(f"  • Signals Generated: {summary['signals_generated']}")
+        report = [HEADER_FMT.format_map(result), "", SUMMARY_FMT.format_map(summary)]
         
         if summary['signals_generated'] > 0:
-            report.append(f"  • Average Confidence: {summary['avg_confidence']:.1%}")
-            report.append(f"  • Average Risk:Reward: {summary['avg_risk_reward']}:1")
-            report.append(f"  • Buy Signals: {summary['buy_signals']}")
-            report.append(f"  • Sell Signals: {summary['sell_signals']}")
-            report.append(f"  • Total Risk Amount: ${summary['total_risk_amount']:,.2f}")
-            report.append(f"  • Total Position Value: ${summary['total_position_value']:,.2f}")
+            report.append(SUMMARY_STATS_FMT.format_map(summary))
         
         if 'error' in summary:
             report.append(f"  • Error: {summary['error']}")
@@ -217,44 +309,59 @@ class SignalsBot:
         
         # Individual signals
         if result['signals']:
-            report.append("TOP TRADING SIGNALS:")
-            report.append("-" * 80)
-            
-            for i, signal in enumerate(result['signals'], 1):
-                report.append(f"\n{i}. {signal['symbol']} - {signal['strategy']} Strategy")
-                report.append(f"   Signal: {signal['signal_type']} | Confidence: {signal['confidence']:.1%}")
-                report.append(f"   Current Price: ${signal['current_price']:.2f} | Gap: {signal['gap_percent']:+.1f}%")
-                report.append(f"   Entry: ${signal['entry_price']:.2f} | Stop: ${signal['stop_loss']:.2f} | Target: ${signal['take_profit']:.2f}")
-                report.append(f"   Risk:Reward: {signal['risk_reward_ratio']}:1")
-                report.append(f"   Position: {signal['position_sizing']['shares']} shares (${signal['position_sizing']['position_value']:,.2f})")
-                report.append(f"   Risk: ${signal['position_sizing']['risk_amount']:,.2f} | Potential Profit: ${signal['position_sizing']['potential_profit']:,.2f}")
-                report.append(f"   Volume: {signal['volume_info']['volume_ratio']:.1f}x normal")
-                report.append(f"   Reasoning: {signal['reasoning']}")
+            report.append(SIGNALS_HEADER)
+            report.extend(
+                SIGNAL_FMT.format_map(_flatten_signal(signal, i))
+                for i, signal in enumerate(result['signals'], 1)
+            )
         else:
             report.append("No trading signals generated.")
         
-        report.append("\n" + "=" * 80)
-        report.append("DISCLAIMER: This is for educational purposes only. Always do your own research.")
-        report.append("=" * 80)
+        report.append(FOOTER)
         
         return "\n".join(report)
 
+def save_result(result: Dict, filename: str) -> None:
+    """Write an analysis result to a JSON file"""
+    with open(filename, 'wb') as f:
+        f.write(orjson.dumps(result, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+
+@dataclass
+class SignalsResult:
+    """Analysis result whose text report and JSON file are only produced on request"""
+    data: Dict
+    bot: SignalsBot
+    
+    @cached_property
+    def formatted_report(self) -> str:
+        return self.bot.format_signals_report(self.data)
+    
+    def save_json(self, filename: Optional[str] = None) -> str:
+        """Save the result as JSON (timestamped file name by default) and return the path"""
+        filename = filename or f"signals_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        save_result(self.data, filename)
+        return filename
+
 # Main execution function
-async def main():
-    """Main function to run the signals bot"""
+async def main(print_report: Optional[bool] = None, save: Union[bool, str] = False) -> Optional[SignalsResult]:
+    """
+    Main function to run the signals bot
+    print_report defaults to printing only when stdout is a terminal; save=True writes
+    a timestamped JSON file and a string saves to that path
+    """
     bot = SignalsBot()
     
     try:
         # Run analysis
-        result = await bot.run_analysis()
+        result = SignalsResult(await bot.run_analysis(), bot)
         
         # Print formatted report
-        report = bot.format_signals_report(result)
-        print(report)
+        if print_report or (print_report is None and sys.stdout.isatty()):
+            print(result.formatted_report)
         
         # Optionally save to file
-        with open(f"signals_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json", 'w') as f:
-            json.dump(result, f, indent=2)
+        if save:
+            print(f"Results saved to {result.save_json(None if save is True else save)}")
         
         return result
         
@@ -263,5 +370,14 @@ async def main():
         print(f"Error running signals bot: {e}")
         return None
 
+def _parse_args(argv: List[str]) -> argparse.Namespace:
+    """Command line options for running signals_bot.py as a script"""
+    parser = argparse.ArgumentParser(description="Generate premarket trading signals")
+    parser.add_argument('--print', dest='print_report', action='store_true', default=None,
+                        help="print the formatted report (default when stdout is a terminal)")
+    parser.add_argument('--save', nargs='?', const=True, default=False, metavar='PATH',
+                        help="save the result as JSON (timestamped file name if PATH is omitted)")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main(**vars(_parse_args(sys.argv[1:]))))
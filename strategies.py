@@ -1,18 +1,24 @@
 """
 Trading strategies for the Signals Bot
 """
-import pandas as pd
 import numpy as np
-from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple
+from dataclasses import dataclass, field
 from datetime import datetime
 import logging
-from data_fetcher import StockData
-from config import trading_config
+from models import StockData
+from config import trading_config, TradingConfig
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+# Signal type codes used by the vectorized strategies
+HOLD, BUY, SELL = 0, 1, -1
+SIGNAL_TYPES = {BUY: 'BUY', SELL: 'SELL', HOLD: 'HOLD'}
+
+@dataclass(slots=True)
 class StrategySignal:
     """Trading signal from a strategy"""
     symbol: str
@@ -30,259 +36,423 @@ class StrategySignal:
         if self.timestamp is None:
             self.timestamp = datetime.now()
 
+@dataclass
+class StockPanel:
+    """Struct-of-arrays view of many stocks, one array element per stock"""
+    symbol: np.ndarray
+    current_price: np.ndarray
+    previous_close: np.ndarray
+    premarket_price: np.ndarray  # NaN where there is no premarket price
+    gap_percent: np.ndarray
+    regular_volume: np.ndarray
+    premarket_volume: np.ndarray
+    avg_volume: np.ndarray
+    # Derived features shared by all strategies, computed once per panel
+    total_volume: np.ndarray = field(init=False)
+    volume_ratio: np.ndarray = field(init=False)  # NaN where there is no average volume
+    
+    def __post_init__(self):
+        self.total_volume = self.regular_volume + self.premarket_volume
+        has_avg_volume = self.avg_volume > 0
+        self.volume_ratio = np.divide(
+            self.total_volume, self.avg_volume,
+            out=np.full(len(self.symbol), np.nan), where=has_avg_volume
+        )
+    
+    @classmethod
+    def from_stock_data(cls, stock_data: Iterable[StockData]) -> "StockPanel":
+        """Build a panel from StockData objects (in iteration order)"""
+        stocks = list(stock_data)
+        
+        def column(values) -> np.ndarray:
+            return np.fromiter(values, dtype=np.float64, count=len(stocks))
+        
+        return cls(
+            symbol=np.array([s.symbol for s in stocks], dtype=object),
+            current_price=column(s.current_price for s in stocks),
+            previous_close=column(s.previous_close for s in stocks),
+            premarket_price=column(s.premarket_price or np.nan for s in stocks),
+            gap_percent=column(s.gap_percent for s in stocks),
+            regular_volume=column(s.regular_volume for s in stocks),
+            premarket_volume=column(s.premarket_volume for s in stocks),
+            avg_volume=column(s.avg_volume for s in stocks)
+        )
+    
+    @classmethod
+    def from_frame(cls, frame: "pd.DataFrame") -> "StockPanel":
+        """Build a panel straight from a symbol-indexed stock frame (in row order)"""
+        def column(name: str) -> np.ndarray:
+            return frame[name].to_numpy(dtype=np.float64)
+        
+        # Zero counts as no premarket price, as in from_stock_data
+        premarket_price = column('premarket_price')
+        premarket_price = np.where(premarket_price == 0, np.nan, premarket_price)
+        
+        return cls(
+            symbol=frame.index.to_numpy(dtype=object),
+            current_price=column('current_price'),
+            previous_close=column('previous_close'),
+            premarket_price=premarket_price,
+            gap_percent=column('gap_percent'),
+            regular_volume=column('regular_volume'),
+            premarket_volume=column('premarket_volume'),
+            avg_volume=column('avg_volume')
+        )
+    
+    def __len__(self) -> int:
+        return len(self.symbol)
+
+def _size_positions(entry_price: np.ndarray, stop_loss: np.ndarray, take_profit: np.ndarray,
+                    config: TradingConfig) -> Dict[str, np.ndarray]:
+    """Position sizing rules shared by strategies and the manager, over aligned price arrays"""
+    account_value = 100000  # $100k account assumption
+    risk_amount = account_value * config.max_risk_per_trade
+    max_position_value = account_value * config.max_position_size
+    
+    # Shares that risk exactly risk_amount (truncated like int()); none when there is no price risk
+    price_risk = np.abs(entry_price - stop_loss)
+    shares = np.divide(risk_amount, price_risk, out=np.zeros(len(price_risk)), where=price_risk > 0).astype(np.int64)
+    position_value = shares * entry_price
+    
+    # Don't exceed max position size
+    capped = position_value > max_position_value
+    shares[capped] = (max_position_value / entry_price[capped]).astype(np.int64)
+    position_value = shares * entry_price
+    
+    return {
+        'shares': shares,
+        'position_value': position_value,
+        'position_percent': (position_value / account_value) * 100,
+        'risk_amount': shares * price_risk,
+        'potential_profit': shares * (take_profit - entry_price),
+        'potential_loss': shares * (entry_price - stop_loss)
+    }
+
 class BaseStrategy:
     """Base class for all trading strategies"""
     
-    def __init__(self, name: str):
+    def __init__(self, name: str, config: Optional[TradingConfig] = None):
         self.name = name
+        self.config = config or trading_config
+        self.weight = self.config.strategy_weights.get(name.lower().replace(' ', '_'), 0.5)
     
-    def analyze(self, stock_data: StockData) -> Optional[StrategySignal]:
-        """Analyze stock data and return a trading signal"""
+    def analyze_panel(self, panel: StockPanel) -> Dict[str, np.ndarray]:
+        """
+        Analyze every stock in the panel at once
+        Returns aligned arrays: signal_type_code (HOLD/BUY/SELL), confidence,
+        entry_price, stop_loss, take_profit and risk_reward_ratio, plus any
+        intermediate arrays describe() needs
+        """
         raise NotImplementedError
     
-    def calculate_position_sizing(self, stock_data: StockData, entry_price: float, stop_loss: float) -> Dict:
-        """Calculate position sizing based on risk management rules"""
-        account_value = 100000  # Assume $100k account for calculation
-        risk_amount = account_value * trading_config.max_risk_per_trade
-        
-        price_risk = abs(entry_price - stop_loss)
-        if price_risk == 0:
-            return {'shares': 0, 'position_value': 0, 'risk_amount': 0}
-        
-        shares = int(risk_amount / price_risk)
-        position_value = shares * entry_price
-        max_position_value = account_value * trading_config.max_position_size
-        
-        # Don't exceed max position size
-        if position_value > max_position_value:
-            shares = int(max_position_value / entry_price)
-            position_value = shares * entry_price
+    def describe(self, panel: StockPanel, result: Dict[str, np.ndarray], i: int) -> str:
+        """Explain the signal for row i of an analyze_panel result"""
+        raise NotImplementedError
+    
+    def build_signal(self, panel: StockPanel, result: Dict[str, np.ndarray], i: int,
+                     timestamp: Optional[datetime] = None) -> StrategySignal:
+        """Materialize the signal for row i of an analyze_panel result"""
+        return StrategySignal(
+            symbol=panel.symbol[i],
+            strategy_name=self.name,
+            signal_type=SIGNAL_TYPES[int(result['signal_type_code'][i])],
+            confidence=float(result['confidence'][i]),
+            entry_price=float(result['entry_price'][i]),
+            stop_loss=float(result['stop_loss'][i]),
+            take_profit=float(result['take_profit'][i]),
+            risk_reward_ratio=float(result['risk_reward_ratio'][i]),
+            reasoning=self.describe(panel, result, i),
+            timestamp=timestamp
+        )
+    
+    def analyze(self, stock_data: StockData) -> Optional[StrategySignal]:
+        """Analyze stock data and return a trading signal"""
+        panel = StockPanel.from_stock_data([stock_data])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = self.analyze_panel(panel)
         
-        return {
-            'shares': shares,
-            'position_value': position_value,
-            'risk_amount': shares * price_risk,
-            'position_percent': (position_value / account_value) * 100
-        }
+        if result['signal_type_code'][0] == HOLD:
+            return None
+        return self.build_signal(panel, result, 0)
+    
+    def calculate_position_sizing(self, stock_data: StockData, entry_price: float, stop_loss: float,
+                                  take_profit: Optional[float] = None) -> Dict:
+        """
+        Calculate position sizing based on risk management rules
+        potential_profit and potential_loss are included only when take_profit is given
+        """
+        sizing = _size_positions(
+            np.array([entry_price], dtype=np.float64),
+            np.array([stop_loss], dtype=np.float64),
+            np.array([entry_price if take_profit is None else take_profit], dtype=np.float64),
+            self.config
+        )
+        if take_profit is None:
+            del sizing['potential_profit'], sizing['potential_loss']
+        return {key: values[0].item() for key, values in sizing.items()}
+
+# Scoring kernels: stateless functions over plain float arrays and scalar
+# thresholds, one per strategy. Each returns aligned arrays of
+# (signal_type_code, confidence, stop_loss, take_profit, risk_reward_ratio);
+# the entry price is always the current price. Up/down branches are selected
+# without masked stores: per-row parameters come from small lookup tables
+# indexed by the direction flag (0 = down, 1 = up) or from the sign of the move.
+
+# Gap momentum: counter-trend bounce on gap downs, momentum on gap ups
+_GAP_STOP_FACTOR = np.array([0.95, 0.97])      # 5% / 3% stop
+_GAP_TARGET_FACTOR = np.array([1.08, 1.06])    # 8% / 6% target
+_GAP_CONFIDENCE_SCALE = np.array([15.0, 10.0])
+_GAP_CONFIDENCE_CAP = np.array([0.8, 0.9])
+
+# Premarket momentum: wider stops on counter-trend reversals
+_PREMARKET_STOP_FACTOR = np.array([0.94, 0.97])    # 6% / 3% stop
+_PREMARKET_TARGET_FACTOR = np.array([1.09, 1.06])  # 9% / 6% target
+
+def _risk_reward(current_price: np.ndarray, stop_loss: np.ndarray, take_profit: np.ndarray) -> np.ndarray:
+    """Absolute reward over absolute risk per share"""
+    reward = take_profit - current_price
+    risk = current_price - stop_loss
+    np.abs(reward, out=reward)
+    np.abs(risk, out=risk)
+    reward /= risk
+    return reward
+
+def _gap_momentum_kernel(gap_percent: np.ndarray, current_price: np.ndarray, volume_ratio: np.ndarray,
+                         gap_threshold: float, volume_threshold: float) -> Tuple[np.ndarray, ...]:
+    """Gap momentum scoring; volume_ratio must already default to 1.0 where unknown"""
+    abs_gap = np.abs(gap_percent)
+    
+    # Strong gap either way with volume: gap ups are momentum buys, gap downs bounce plays
+    signal = abs_gap >= gap_threshold
+    signal &= volume_ratio >= volume_threshold
+    branch = (gap_percent >= gap_threshold).astype(np.intp)
+    
+    stop_loss = current_price * _GAP_STOP_FACTOR[branch]
+    take_profit = current_price * _GAP_TARGET_FACTOR[branch]
+    
+    # Gap ups: min(0.9, gap/10 * ratio/3), bounces: min(0.8, |gap|/15 * ratio/3)
+    confidence = abs_gap / _GAP_CONFIDENCE_SCALE[branch]
+    confidence *= volume_ratio / 3.0
+    np.minimum(confidence, _GAP_CONFIDENCE_CAP[branch], out=confidence)
+    
+    signal_type_code = signal * BUY
+    return signal_type_code, confidence, stop_loss, take_profit, _risk_reward(current_price, stop_loss, take_profit)
+
+def _volume_breakout_kernel(gap_percent: np.ndarray, current_price: np.ndarray, volume_ratio: np.ndarray,
+                            volume_threshold: float) -> Tuple[np.ndarray, ...]:
+    """Volume breakout scoring; volume_ratio is NaN where unknown (never signals)"""
+    # Direction follows the gap: positive momentum buys (+1), negative momentum shorts (-1)
+    direction = np.sign(gap_percent)
+    
+    # Significant volume spike (3x normal volume by default) with more than a 1% gap
+    signal = np.abs(gap_percent) > 1.0
+    signal &= volume_ratio >= volume_threshold * 1.5
+    
+    # 4% stop / 8% target, mirrored for shorts
+    stop_loss = current_price * (1.0 - 0.04 * direction)
+    take_profit = current_price * (1.0 + 0.08 * direction)
+    
+    confidence = volume_ratio / 5.0
+    np.minimum(confidence, 0.85, out=confidence)
+    
+    signal_type_code = (signal * direction).astype(np.int64)  # BUY == 1, SELL == -1
+    return signal_type_code, confidence, stop_loss, take_profit, _risk_reward(current_price, stop_loss, take_profit)
+
+def _premarket_momentum_kernel(premarket_move: np.ndarray, current_price: np.ndarray,
+                               premarket_volume_ratio: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """Premarket momentum scoring; premarket_move is NaN where there is no previous close"""
+    abs_move = np.abs(premarket_move)
+    
+    # Significant premarket moves (more than 2% either way): momentum up, oversold reversal down
+    signal = abs_move > 2.0
+    branch = (premarket_move > 0.0).astype(np.intp)
+    
+    stop_loss = current_price * _PREMARKET_STOP_FACTOR[branch]
+    take_profit = current_price * _PREMARKET_TARGET_FACTOR[branch]
+    
+    confidence = abs_move / 8.0
+    confidence *= premarket_volume_ratio
+    np.minimum(confidence, 0.8, out=confidence)
+    
+    signal_type_code = signal * BUY
+    return signal_type_code, confidence, stop_loss, take_profit, _risk_reward(current_price, stop_loss, take_profit)
+
+def _kernel_result(current_price: np.ndarray, scores: Tuple[np.ndarray, ...], **extra: np.ndarray) -> Dict[str, np.ndarray]:
+    signal_type_code, confidence, stop_loss, take_profit, risk_reward_ratio = scores
+    return {
+        'signal_type_code': signal_type_code,
+        'confidence': confidence,
+        'entry_price': current_price,
+        'stop_loss': stop_loss,
+        'take_profit': take_profit,
+        'risk_reward_ratio': risk_reward_ratio,
+        **extra
+    }
 
 class GapMomentumStrategy(BaseStrategy):
     """Gap momentum strategy - trades gaps with volume confirmation"""
     
-    def __init__(self):
-        super().__init__("Gap Momentum")
+    def __init__(self, config: Optional[TradingConfig] = None):
+        super().__init__("Gap Momentum", config)
     
-    def analyze(self, stock_data: StockData) -> Optional[StrategySignal]:
+    def analyze_panel(self, panel: StockPanel) -> Dict[str, np.ndarray]:
         """Analyze gap momentum signals"""
-        try:
-            gap_percent = stock_data.gap_percent
-            current_price = stock_data.current_price
-            volume_ratio = 1.0
-            
-            # Calculate volume ratio if we have average volume data
-            if stock_data.avg_volume > 0:
-                total_volume = stock_data.regular_volume + stock_data.premarket_volume
-                volume_ratio = total_volume / stock_data.avg_volume
-            
-            # Gap up strategy
-            if gap_percent >= trading_config.gap_threshold_percent:
-                if volume_ratio >= trading_config.volume_threshold_multiplier:
-                    # Strong gap up with volume - bullish signal
-                    entry_price = current_price
-                    stop_loss = current_price * 0.97  # 3% stop loss
-                    take_profit = current_price * 1.06  # 6% take profit
-                    
-                    confidence = min(0.9, (gap_percent / 10.0) * (volume_ratio / 3.0))
-                    
-                    return StrategySignal(
-                        symbol=stock_data.symbol,
-                        strategy_name=self.name,
-                        signal_type='BUY',
-                        confidence=confidence,
-                        entry_price=entry_price,
-                        stop_loss=stop_loss,
-                        take_profit=take_profit,
-                        risk_reward_ratio=(take_profit - entry_price) / (entry_price - stop_loss),
-                        reasoning=f"Gap up {gap_percent:.1f}% with {volume_ratio:.1f}x volume"
-                    )
-            
-            # Gap down strategy
-            elif gap_percent <= -trading_config.gap_threshold_percent:
-                if volume_ratio >= trading_config.volume_threshold_multiplier:
-                    # Strong gap down with volume - potential bounce
-                    entry_price = current_price
-                    stop_loss = current_price * 0.95  # 5% stop loss
-                    take_profit = current_price * 1.08  # 8% take profit (bigger target for counter-trend)
-                    
-                    confidence = min(0.8, (abs(gap_percent) / 15.0) * (volume_ratio / 3.0))
-                    
-                    return StrategySignal(
-                        symbol=stock_data.symbol,
-                        strategy_name=self.name,
-                        signal_type='BUY',
-                        confidence=confidence,
-                        entry_price=entry_price,
-                        stop_loss=stop_loss,
-                        take_profit=take_profit,
-                        risk_reward_ratio=(take_profit - entry_price) / (entry_price - stop_loss),
-                        reasoning=f"Gap down {gap_percent:.1f}% bounce play with {volume_ratio:.1f}x volume"
-                    )
-            
-            return None
-            
-        except Exception as e:
-            logger.error(f"Error in gap momentum analysis for {stock_data.symbol}: {e}")
-            return None
+        # Volume ratio defaults to 1.0 when we have no average volume data
+        volume_ratio = np.nan_to_num(panel.volume_ratio, nan=1.0)
+        scores = _gap_momentum_kernel(
+            panel.gap_percent, panel.current_price, volume_ratio,
+            self.config.gap_threshold_percent, self.config.volume_threshold_multiplier
+        )
+        return _kernel_result(panel.current_price, scores, volume_ratio=volume_ratio)
+    
+    def describe(self, panel: StockPanel, result: Dict[str, np.ndarray], i: int) -> str:
+        gap_percent = panel.gap_percent[i]
+        volume_ratio = result['volume_ratio'][i]
+        if gap_percent >= self.config.gap_threshold_percent:
+            return f"Gap up {gap_percent:.1f}% with {volume_ratio:.1f}x volume"
+        return f"Gap down {gap_percent:.1f}% bounce play with {volume_ratio:.1f}x volume"
 
 class VolumeBreakoutStrategy(BaseStrategy):
     """Volume breakout strategy - trades volume spikes"""
     
-    def __init__(self):
-        super().__init__("Volume Breakout")
+    def __init__(self, config: Optional[TradingConfig] = None):
+        super().__init__("Volume Breakout", config)
     
-    def analyze(self, stock_data: StockData) -> Optional[StrategySignal]:
+    def analyze_panel(self, panel: StockPanel) -> Dict[str, np.ndarray]:
         """Analyze volume breakout signals"""
-        try:
-            current_price = stock_data.current_price
-            total_volume = stock_data.regular_volume + stock_data.premarket_volume
-            
-            if stock_data.avg_volume == 0:
-                return None
-            
-            volume_ratio = total_volume / stock_data.avg_volume
-            
-            # Look for significant volume spike
-            if volume_ratio >= trading_config.volume_threshold_multiplier * 1.5:  # 3x normal volume
-                gap_percent = stock_data.gap_percent
-                
-                # Determine direction based on gap
-                if gap_percent > 1.0:  # Positive momentum
-                    entry_price = current_price
-                    stop_loss = current_price * 0.96  # 4% stop loss
-                    take_profit = current_price * 1.08  # 8% take profit
-                    signal_type = 'BUY'
-                    reasoning = f"Volume breakout {volume_ratio:.1f}x with {gap_percent:.1f}% gap up"
-                    
-                elif gap_percent < -1.0:  # Negative momentum - short opportunity
-                    entry_price = current_price
-                    stop_loss = current_price * 1.04  # 4% stop loss for short
-                    take_profit = current_price * 0.92  # 8% take profit for short
-                    signal_type = 'SELL'
-                    reasoning = f"Volume breakout {volume_ratio:.1f}x with {gap_percent:.1f}% gap down"
-                
-                else:
-                    return None
-                
-                confidence = min(0.85, volume_ratio / 5.0)
-                
-                rr_ratio = abs(take_profit - entry_price) / abs(entry_price - stop_loss)
-                
-                return StrategySignal(
-                    symbol=stock_data.symbol,
-                    strategy_name=self.name,
-                    signal_type=signal_type,
-                    confidence=confidence,
-                    entry_price=entry_price,
-                    stop_loss=stop_loss,
-                    take_profit=take_profit,
-                    risk_reward_ratio=rr_ratio,
-                    reasoning=reasoning
-                )
-            
-            return None
-            
-        except Exception as e:
-            logger.error(f"Error in volume breakout analysis for {stock_data.symbol}: {e}")
-            return None
+        scores = _volume_breakout_kernel(
+            panel.gap_percent, panel.current_price, panel.volume_ratio,
+            self.config.volume_threshold_multiplier
+        )
+        return _kernel_result(panel.current_price, scores)
+    
+    def describe(self, panel: StockPanel, result: Dict[str, np.ndarray], i: int) -> str:
+        gap_percent = panel.gap_percent[i]
+        direction = "up" if result['signal_type_code'][i] == BUY else "down"
+        return f"Volume breakout {panel.volume_ratio[i]:.1f}x with {gap_percent:.1f}% gap {direction}"
 
 class PremarketMomentumStrategy(BaseStrategy):
     """Premarket momentum strategy - trades premarket price action"""
     
-    def __init__(self):
-        super().__init__("Premarket Momentum")
+    def __init__(self, config: Optional[TradingConfig] = None):
+        super().__init__("Premarket Momentum", config)
     
-    def analyze(self, stock_data: StockData) -> Optional[StrategySignal]:
+    def analyze_panel(self, panel: StockPanel) -> Dict[str, np.ndarray]:
         """Analyze premarket momentum signals"""
-        try:
-            current_price = stock_data.current_price
-            previous_close = stock_data.previous_close
-            premarket_price = stock_data.premarket_price or current_price
-            
-            # Calculate premarket move
-            if previous_close > 0:
-                premarket_move = ((premarket_price - previous_close) / previous_close) * 100
-            else:
-                return None
-            
-            # Look for significant premarket moves
-            if abs(premarket_move) >= 2.0:  # At least 2% premarket move
-                premarket_volume_ratio = 1.0
-                if stock_data.avg_volume > 0 and stock_data.premarket_volume > 0:
-                    # Calculate what portion of daily volume happened premarket
-                    premarket_volume_ratio = stock_data.premarket_volume / (stock_data.avg_volume * 0.1)  # 10% of daily volume is significant premarket
-                
-                if premarket_move > 2.0:  # Positive premarket momentum
-                    entry_price = current_price
-                    stop_loss = current_price * 0.97  # 3% stop loss
-                    take_profit = current_price * 1.06  # 6% take profit
-                    signal_type = 'BUY'
-                    reasoning = f"Premarket momentum +{premarket_move:.1f}% with volume"
-                    
-                elif premarket_move < -2.0:  # Negative premarket momentum
-                    # Look for potential reversal
-                    entry_price = current_price
-                    stop_loss = current_price * 0.94  # 6% stop loss (wider for counter-trend)
-                    take_profit = current_price * 1.09  # 9% take profit
-                    signal_type = 'BUY'
-                    reasoning = f"Premarket oversold {premarket_move:.1f}% reversal play"
-                
-                else:
-                    return None
-                
-                confidence = min(0.8, (abs(premarket_move) / 8.0) * premarket_volume_ratio)
-                
-                rr_ratio = (take_profit - entry_price) / (entry_price - stop_loss)
-                
-                return StrategySignal(
-                    symbol=stock_data.symbol,
-                    strategy_name=self.name,
-                    signal_type=signal_type,
-                    confidence=confidence,
-                    entry_price=entry_price,
-                    stop_loss=stop_loss,
-                    take_profit=take_profit,
-                    risk_reward_ratio=rr_ratio,
-                    reasoning=reasoning
-                )
-            
-            return None
-            
-        except Exception as e:
-            logger.error(f"Error in premarket momentum analysis for {stock_data.symbol}: {e}")
-            return None
+        current_price = panel.current_price
+        previous_close = panel.previous_close
+        premarket_price = np.where(np.isnan(panel.premarket_price), current_price, panel.premarket_price)
+        
+        # Calculate premarket move (undefined without a previous close)
+        has_previous_close = previous_close > 0
+        premarket_move = np.where(
+            has_previous_close,
+            (premarket_price - previous_close) / np.where(has_previous_close, previous_close, 1.0) * 100,
+            np.nan
+        )
+        
+        # What portion of daily volume happened premarket (10% of daily volume is significant)
+        has_premarket_volume = (panel.avg_volume > 0) & (panel.premarket_volume > 0)
+        premarket_volume_ratio = np.where(
+            has_premarket_volume,
+            panel.premarket_volume / (np.where(has_premarket_volume, panel.avg_volume, 1.0) * 0.1),
+            1.0
+        )
+        
+        scores = _premarket_momentum_kernel(premarket_move, current_price, premarket_volume_ratio)
+        return _kernel_result(current_price, scores, premarket_move=premarket_move)
+    
+    def describe(self, panel: StockPanel, result: Dict[str, np.ndarray], i: int) -> str:
+        premarket_move = result['premarket_move'][i]
+        if premarket_move > 0:
+            return f"Premarket momentum +{premarket_move:.1f}% with volume"
+        return f"Premarket oversold {premarket_move:.1f}% reversal play"
 
 class StrategyManager:
     """Manages multiple trading strategies"""
     
-    def __init__(self):
+    def __init__(self, config: Optional[TradingConfig] = None):
+        self.config = config or trading_config
         self.strategies = [
-            GapMomentumStrategy(),
-            VolumeBreakoutStrategy(),
-            PremarketMomentumStrategy()
+            GapMomentumStrategy(self.config),
+            VolumeBreakoutStrategy(self.config),
+            PremarketMomentumStrategy(self.config)
+        ]
+        self._weight_by_name = {strategy.name: strategy.weight for strategy in self.strategies}
+    
+    def analyze_panel(self, panel: StockPanel) -> List[Tuple[int, StrategySignal]]:
+        """
+        Run all strategies over a panel and pick each stock's best signal
+        Returns (row, signal) pairs in row order, only for stocks with a signal
+        """
+        min_rr = self.config.min_risk_reward_ratio
+        n = len(panel)
+        best_score = np.full(n, -np.inf)
+        best_strategy = np.full(n, -1)
+        results = []
+        
+        # Bad inputs are handled by guard masks in the kernels and errstate,
+        # so only a genuine bug lands in the single outer handler
+        try:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                for k, strategy in enumerate(self.strategies):
+                    result = strategy.analyze_panel(panel)
+                    results.append(result)
+                    
+                    # Minimum confidence threshold and risk-reward ratio
+                    valid = (
+                        (result['signal_type_code'] != HOLD)
+                        & (result['confidence'] > 0.3)
+                        & (result['risk_reward_ratio'] >= min_rr)
+                    )
+                    
+                    # Weight signals by strategy weights and confidence (first strategy wins ties)
+                    weighted_score = result['confidence'] * strategy.weight
+                    better = valid & (weighted_score > best_score)
+                    best_score[better] = weighted_score[better]
+                    best_strategy[better] = k
+        except Exception as e:
+            if logger.isEnabledFor(logging.ERROR):
+                logger.error(f"Error running strategies on {n} stocks: {e}")
+            return []
+        
+        # All signals from one panel share a single timestamp
+        timestamp = datetime.now()
+        rows = np.flatnonzero(best_strategy >= 0)
+        return [
+            (int(i), self.strategies[k].build_signal(panel, results[k], i, timestamp))
+            for i, k in zip(rows, best_strategy[rows])
         ]
     
+    def size_positions(self, signals: Sequence[StrategySignal]) -> Dict[str, np.ndarray]:
+        """
+        Size positions for many signals at once using the risk management rules
+        Returns aligned arrays: shares, position_value, position_percent,
+        risk_amount, potential_profit and potential_loss
+        """
+        n = len(signals)
+        return _size_positions(
+            np.fromiter((s.entry_price for s in signals), dtype=np.float64, count=n),
+            np.fromiter((s.stop_loss for s in signals), dtype=np.float64, count=n),
+            np.fromiter((s.take_profit for s in signals), dtype=np.float64, count=n),
+            self.config
+        )
+    
     def analyze_stock(self, stock_data: StockData) -> List[StrategySignal]:
         """Run all strategies on a stock and return signals"""
+        min_rr = self.config.min_risk_reward_ratio
         signals = []
         
-        for strategy in self.strategies:
-            try:
+        try:
+            for strategy in self.strategies:
                 signal = strategy.analyze(stock_data)
                 if signal and signal.confidence > 0.3:  # Minimum confidence threshold
                     # Check risk-reward ratio
-                    if signal.risk_reward_ratio >= trading_config.min_risk_reward_ratio:
+                    if signal.risk_reward_ratio >= min_rr:
                         signals.append(signal)
-            except Exception as e:
-                logger.error(f"Error running strategy {strategy.name} on {stock_data.symbol}: {e}")
+        except Exception as e:
+            if logger.isEnabledFor(logging.ERROR):
+                logger.error(f"Error running strategies on {stock_data.symbol}: {e}")
         
         return signals
     
@@ -292,15 +462,13 @@ class StrategyManager:
             return None
         
         # Weight signals by strategy weights and confidence
+        weight_by_name = self._weight_by_name
         weighted_signals = []
         
         for signal in signals:
-            strategy_weight = trading_config.strategy_weights.get(
-                signal.strategy_name.lower().replace(' ', '_'), 0.5
-            )
-            weighted_score = signal.confidence * strategy_weight
+            weighted_score = signal.confidence * weight_by_name.get(signal.strategy_name, 0.5)
             weighted_signals.append((weighted_score, signal))
         
         # Return signal with highest weighted score
         weighted_signals.sort(key=lambda x: x[0], reverse=True)
-        return weighted_signals[0][1]
\ No newline at end of file
+        return weighted_signals[0][1]